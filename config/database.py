@@ -1,13 +1,52 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from config.settings import settings
 
 class Base(DeclarativeBase):
     pass
 
-engine = create_engine(f"sqlite:///{settings.DB_PATH}", echo=False, future=True)
+# The GUI, the scheduler and backup workers use connections from different threads
+engine = create_engine(
+    f"sqlite:///{settings.DB_PATH}", echo=False, future=True,
+    connect_args={"check_same_thread": False},
+)
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, autoflush=False, autocommit=False)
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragma(dbapi_conn, _):
+    """
+    Applied to every new pooled connection.
+    - WAL lets the GUI refresh, plot and diff viewer read while a backup is writing. It is persistent
+      in the database file and adds -wal/-shm side files; the DB must stay on a local disk.
+    - synchronous=NORMAL only fsyncs at checkpoints: a power loss can drop the last commits,
+      but never corrupts the database.
+    - temp_store, cache_size (64MB per connection) and mmap_size (256MB) trade memory for fewer reads.
+    """
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA cache_size=-65536")  # 64MB
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.close()
+
 def init_db():
     from core import models  # noqa: F401
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    _migrate()
+
+def _migrate():
+    """
+    create_all() skips existing tables; add nullable columns and indexes introduced
+    since an existing database was created.
+    """
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing and col.nullable:
+                    col_type = col.type.compile(dialect=engine.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
\ No newline at end of file
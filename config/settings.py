@@ -15,5 +15,6 @@ class Settings:
     SMTP_PASS: str = os.getenv("SMTP_PASS", "")
     EMAIL_TO: str = os.getenv("EMAIL_TO", "")
     DESKTOP_NOTIFICATIONS: bool = os.getenv("DESKTOP_NOTIFICATIONS", "true").lower() == "true"
+    PLOT_MAX_POINTS: int = int(os.getenv("PLOT_MAX_POINTS", "500"))
 
 settings = Settings()
\ No newline at end of file
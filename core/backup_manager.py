@@ -1,26 +1,127 @@
 import logging
+import os
+import shutil
+import time
 from pathlib import Path
-from zipfile import ZipFile, ZIP_DEFLATED
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED, ZIP64_LIMIT
+from concurrent.futures import ThreadPoolExecutor, Future
+from collections import deque
+import zlib
+import mimetypes
 import json
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 from datetime import datetime
 
 from core.models import Website, BackupSnapshot, BackupFile
 from core.crawler import crawl_website
-from core.utils import domain_from_url, timestamp_str
+from core.utils import domain_from_url, timestamp_str, manifest_sha256
 from config.settings import settings
 from core.notifier import Notifier
 
 logger = logging.getLogger(__name__)
 
+INSERT_BATCH_SIZE = 10_000
+ZIP_COPY_BUFFER_SIZE = 1024 * 1024
+ZIP_COMPRESS_LEVEL = 1
+PARALLEL_ZIP_MAX_FILE_SIZE = 64 * 1024 * 1024
+# Source bytes queued for parallel compression at once; each holds its input and output in memory
+PARALLEL_ZIP_MAX_IN_FLIGHT_BYTES = 128 * 1024 * 1024
+
+# Content-addressable store shared by all snapshots, under BACKUP_ROOT
+OBJECTS_DIR = ".objects"
+OBJECT_PRUNE_GRACE_SECONDS = 3600
+
+# Payloads that are already compressed gain nothing from deflate
+STORED_CONTENT_PREFIXES = ("image/", "video/", "audio/", "font/")
+STORED_CONTENT_TYPES = {"application/zip", "application/gzip", "application/x-gzip", "application/pdf"}
+
+def compression_for(content_type: str) -> int:
+    ct = content_type.lower()
+    if ct.startswith(STORED_CONTENT_PREFIXES) or ct in STORED_CONTENT_TYPES:
+        return ZIP_STORED
+    return ZIP_DEFLATED
+
+def _compress_file(path: str, compress_type: int) -> tuple[bytes, int, int]:
+    """
+    Read and compress one file; returns (payload, crc32, uncompressed size).
+    Produces the same raw deflate stream ZipFile would write.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    crc = zlib.crc32(data)
+    if compress_type == ZIP_DEFLATED:
+        compressor = zlib.compressobj(ZIP_COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+    else:
+        payload = data
+    return payload, crc, len(data)
+
+def _write_precompressed(zf: ZipFile, zi: ZipInfo, payload: bytes, crc: int, size: int):
+    """
+    Append an entry whose data was compressed elsewhere.
+    zipfile has no public API for this; mirrors ZipFile._open_to_write and _ZipWriteFile.close.
+    """
+    zi.file_size = size
+    zi.compress_size = len(payload)
+    zi.CRC = crc
+    zi.flag_bits = 0
+    if not zi.external_attr:
+        zi.external_attr = 0o600 << 16
+    zip64 = size > ZIP64_LIMIT or zi.compress_size > ZIP64_LIMIT
+    with zf._lock:
+        zf.fp.seek(zf.start_dir)
+        zi.header_offset = zf.fp.tell()
+        zf._writecheck(zi)
+        zf._didModify = True
+        zf.fp.write(zi.FileHeader(zip64))
+        zf.fp.write(payload)
+        zf.start_dir = zf.fp.tell()
+        zf.filelist.append(zi)
+        zf.NameToInfo[zi.filename] = zi
+
 class BackupManager:
     def __init__(self, session: Session):
         self.session = session
         self.notifier = Notifier()
 
+    def close(self):
+        self.notifier.close()
+
     def _snapshot_dir(self, domain: str, ts: str) -> Path:
         return Path(settings.BACKUP_ROOT) / domain / ts
 
+    def _object_root(self) -> Path:
+        return Path(settings.BACKUP_ROOT) / OBJECTS_DIR
+
+    def _previous_files(self, website: Website) -> dict[str, dict]:
+        """
+        File records of the website's latest snapshot keyed by url, used for conditional requests.
+        """
+        prev = self.session.execute(
+            select(BackupSnapshot)
+            .where(BackupSnapshot.website_id == website.id)
+            .order_by(BackupSnapshot.created_at.desc())
+            .limit(1)
+        ).scalar_one_or_none()
+        if prev is None:
+            return {}
+        rows = self.session.execute(
+            select(BackupFile.url, BackupFile.rel_path, BackupFile.size, BackupFile.sha256,
+                   BackupFile.content_type, BackupFile.etag, BackupFile.last_modified)
+            .where(BackupFile.snapshot_id == prev.id)
+        ).all()
+        previous = {}
+        for r in rows:
+            if not (r.etag or r.last_modified):
+                continue
+            previous[r.url] = {
+                "rel_path": r.rel_path, "size": r.size, "sha256": r.sha256, "content_type": r.content_type,
+                "etag": r.etag, "last_modified": r.last_modified,
+                "path": None if prev.compressed else str(Path(prev.path) / r.rel_path),
+            }
+        return previous
+
     def run_backup(self, website_id: int, progress_cb=None) -> BackupSnapshot | None:
         website = self.session.get(Website, website_id)
         if not website or not website.active:
@@ -40,7 +141,9 @@ class BackupManager:
                 depth=website.crawl_depth,
                 include_assets={"images": website.include_images, "css": website.include_css, "js": website.include_js},
                 max_workers=website.max_workers or settings.MAX_WORKERS,
-                progress_cb=progress_cb
+                progress_cb=progress_cb,
+                object_root=self._object_root(),
+                previous=self._previous_files(website),
             )
 
             # Save metadata
@@ -59,22 +162,24 @@ class BackupManager:
             # Create DB snapshot
             snapshot = BackupSnapshot(
                 website_id=website.id, timestamp=ts, path=str(snap_dir), file_count=len(files_meta),
-                total_size=total_size, compressed=False
+                total_size=total_size, sha256=manifest_sha256(files_meta), compressed=False
             )
             self.session.add(snapshot)
             self.session.flush()
 
-            # Add files entries
-            bf_objs = [
-                BackupFile(
-                    snapshot_id=snapshot.id, url=f["url"], rel_path=f["rel_path"], size=f["size"],
-                    sha256=f.get("sha256"), content_type=f.get("content_type")
-                )
+            # Add files entries (Core bulk insert, no ORM instances)
+            rows = [
+                {
+                    "snapshot_id": snapshot.id, "url": f["url"], "rel_path": f["rel_path"], "size": f["size"],
+                    "sha256": f.get("sha256"), "content_type": f.get("content_type"),
+                    "etag": f.get("etag"), "last_modified": f.get("last_modified")
+                }
                 for f in files_meta
             ]
-            self.session.add_all(bf_objs)
-            self.session.commit()
+            for i in range(0, len(rows), INSERT_BATCH_SIZE):
+                self.session.execute(insert(BackupFile), rows[i:i + INSERT_BATCH_SIZE])
 
+            # Snapshot, files and website status land in a single transaction
             website.last_run_at = datetime.utcnow()
             website.last_status = f"OK ({len(files_meta)} files, {total_size} bytes)"
             self.session.commit()
@@ -110,8 +215,13 @@ class BackupManager:
         """
         - Compress older snapshots (except most recent 2) if compress_old=True
         - Retain only last retention_limit snapshots (zipped or unzipped), delete older
+        All state changes are committed once at the end.
         """
-        snaps = list(sorted(website.snapshots, key=lambda s: s.created_at, reverse=True))
+        snaps = self.session.execute(
+            select(BackupSnapshot)
+            .where(BackupSnapshot.website_id == website.id)
+            .order_by(BackupSnapshot.created_at.desc())
+        ).scalars().all()
         if not snaps:
             return
 
@@ -119,51 +229,107 @@ class BackupManager:
         if website.compress_old:
             for s in snaps[2:]:
                 if not s.compressed:
-                    self._zip_snapshot(Path(s.path))
+                    self._zip_snapshot(s)
                     s.compressed = True
-                    self.session.commit()
                     logger.info(f"Compressed snapshot {s.timestamp} for {website.domain}")
 
         # Prune beyond retention limit
         limit = max(1, website.retention_limit or 10)
         for s in snaps[limit:]:
             self._delete_snapshot(s)
+        self.session.commit()
+
+        if (website.compress_old and len(snaps) > 2) or len(snaps) > limit:
+            self._prune_objects()
+
+    def _prune_objects(self):
+        """
+        Drop stored objects no snapshot directory links to any more (link count 1).
+        Recently written objects are skipped so a running crawl can still link them.
+        """
+        root = self._object_root()
+        if not root.is_dir():
+            return
+        cutoff = time.time() - OBJECT_PRUNE_GRACE_SECONDS
+        removed = 0
+        for bucket in os.scandir(root):
+            if not bucket.is_dir(follow_symlinks=False) or bucket.name == "tmp":
+                continue
+            for entry in os.scandir(bucket.path):
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    if st.st_nlink <= 1 and st.st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except OSError as e:
+                    logger.warning(f"Failed to prune object {entry.name}: {e}")
+        if removed:
+            logger.info(f"Pruned {removed} unreferenced objects")
+
+    def _content_types(self, snapshot: BackupSnapshot) -> dict[str, str | None]:
+        rows = self.session.execute(
+            select(BackupFile.rel_path, BackupFile.content_type).where(BackupFile.snapshot_id == snapshot.id)
+        ).all()
+        return {Path(rel).as_posix(): ct for rel, ct in rows}
 
-    def _zip_snapshot(self, snap_dir: Path):
+    def _zip_snapshot(self, snapshot: BackupSnapshot):
+        snap_dir = Path(snapshot.path)
         zip_path = snap_dir.with_suffix(".zip")
-        with ZipFile(zip_path, "w", compression=ZIP_DEFLATED) as zf:
-            for p in snap_dir.rglob("*"):
-                if p.is_file():
-                    zf.write(p, arcname=p.relative_to(snap_dir))
+        if zip_path.exists():
+            # The archive only appears once complete (see os.replace below): an earlier pass died
+            # before compressed=True was committed. Finish its cleanup instead of re-zipping.
+            shutil.rmtree(snap_dir, ignore_errors=True)
+            return
+        tmp_path = zip_path.with_suffix(".zip.tmp")
+        content_types = self._content_types(snapshot)
+        buf = bytearray(ZIP_COPY_BUFFER_SIZE)
+        workers = os.cpu_count() or 1
+        # Files are deflated on a thread pool (zlib releases the GIL) and appended in order;
+        # in_flight is bounded by file count and by total source bytes, so memory stays flat
+        # regardless of core count.
+        in_flight: deque[tuple[ZipInfo, Future]] = deque()
+        in_flight_bytes = 0
+        with ZipFile(tmp_path, "w", compression=ZIP_DEFLATED) as zf, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            # os.walk classifies entries from scandir's d_type instead of a stat per path
+            for dirpath, _, filenames in os.walk(snap_dir):
+                for name in filenames:
+                    src_path = os.path.join(dirpath, name)
+                    arcname = Path(os.path.relpath(src_path, snap_dir)).as_posix()
+                    ct = content_types.get(arcname) or mimetypes.guess_type(arcname)[0] or ""
+                    zi = ZipInfo.from_file(src_path, arcname)
+                    zi.compress_type = compression_for(ct)
+                    if zi.file_size > PARALLEL_ZIP_MAX_FILE_SIZE:
+                        # Too large to hold in memory: stream it on this thread
+                        zi._compresslevel = ZIP_COMPRESS_LEVEL  # ZipFile.open() takes the level from the ZipInfo
+                        with open(src_path, "rb", buffering=0) as src, zf.open(zi, "w") as dst:
+                            view = memoryview(buf)
+                            while n := src.readinto(buf):
+                                dst.write(view[:n])
+                        continue
+                    while in_flight and (len(in_flight) >= workers * 2
+                                         or in_flight_bytes + zi.file_size > PARALLEL_ZIP_MAX_IN_FLIGHT_BYTES):
+                        done_zi, future = in_flight.popleft()
+                        in_flight_bytes -= done_zi.file_size
+                        _write_precompressed(zf, done_zi, *future.result())
+                    in_flight.append((zi, pool.submit(_compress_file, src_path, zi.compress_type)))
+                    in_flight_bytes += zi.file_size
+            while in_flight:
+                done_zi, future = in_flight.popleft()
+                _write_precompressed(zf, done_zi, *future.result())
+        os.replace(tmp_path, zip_path)
         # remove original directory
-        for p in sorted(snap_dir.rglob("*"), reverse=True):
-            if p.is_file():
-                p.unlink(missing_ok=True)
-            else:
-                try:
-                    p.rmdir()
-                except Exception:
-                    pass
-        snap_dir.rmdir()
+        shutil.rmtree(snap_dir, ignore_errors=True)
 
     def _delete_snapshot(self, snapshot: BackupSnapshot):
         path = Path(snapshot.path)
         zip_path = path.with_suffix(".zip")
         try:
             if path.exists():
-                for p in sorted(path.rglob("*"), reverse=True):
-                    if p.is_file():
-                        p.unlink(missing_ok=True)
-                    else:
-                        try:
-                            p.rmdir()
-                        except Exception:
-                            pass
-                path.rmdir()
+                shutil.rmtree(path)
             if zip_path.exists():
                 zip_path.unlink(missing_ok=True)
         except Exception as e:
             logger.warning(f"Failed to delete snapshot {snapshot.id}: {e}")
         self.session.delete(snapshot)
-        self.session.commit()
         logger.info(f"Deleted snapshot {snapshot.timestamp}")
\ No newline at end of file
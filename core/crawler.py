@@ -1,14 +1,25 @@
 import logging
+import math
+import os
+import tempfile
+import threading
+from collections import deque
+from hashlib import sha256
 from urllib.parse import urljoin, urlparse
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from collections import deque
-from bs4 import BeautifulSoup
+from typing import Iterable
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from http.cookiejar import DefaultCookiePolicy
+from lxml.html import HtmlElement
 from tenacity import retry, stop_after_attempt, wait_random_exponential, retry_if_exception_type
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout, ConnectionError
 
-from core.utils import domain_from_url, is_internal_link, url_to_relpath, ensure_dir, file_sha256, rewrite_html_links
+from core.utils import (
+    domain_from_url, is_internal_link, url_to_relpath, ensure_dir, file_sha256, rewrite_html_links,
+    object_path, link_object, parse_html, serialize_html, LINK_ATTRS
+)
 
 logger = logging.getLogger(__name__)
 
@@ -16,72 +27,322 @@ HEADERS = {
     "User-Agent": "SiteGuardian/1.0 (+https://example.com)"
 }
 
+STREAM_CHUNK_SIZE = 64 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# mkstemp creates files 0600; stored objects get the mode a plain open() would give them.
+# Read once at import: os.umask can only be queried by setting it, which is not thread-safe.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+OBJECT_FILE_MODE = 0o666 & ~_UMASK
+
+# One keep-alive session for all fetches; sized for the largest per-site worker count.
+# Retries are handled by tenacity, so the adapter does not retry on its own.
+# Cookies are refused so crawls stay stateless like one-off requests, even though the
+# session lives for the whole process and is shared by every site.
+_session = requests.Session()
+_session.headers.update(HEADERS)
+_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=0)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
 @retry(reraise=True, stop=stop_after_attempt(3), wait=wait_random_exponential(multiplier=1, max=30),
        retry=retry_if_exception_type((RequestException, Timeout, ConnectionError)))
-def fetch(url: str) -> requests.Response:
-    resp = requests.get(url, headers=HEADERS, timeout=15)
-    resp.raise_for_status()
+def fetch(url: str, headers: dict | None = None) -> requests.Response:
+    """
+    Return a streaming response; the body is read by the caller (resp.text or save_stream).
+    Extra headers (e.g. If-None-Match) may yield a 304, which raise_for_status lets through.
+    """
+    resp = _session.get(url, headers=headers, timeout=15, stream=True)
+    try:
+        resp.raise_for_status()
+    except Exception:
+        resp.close()
+        raise
     return resp
 
-def extract_links(html: str, base_url: str, include_assets: dict) -> tuple[set[str], dict[str, list[str]]]:
+def extract_links(html: str, base_url: str, include_assets: dict) -> tuple[HtmlElement, set[str], dict[str, list[str]]]:
     """
-    Returns: (internal_page_links, assets_by_page)
+    Returns: (tree, internal_page_links, assets_by_page)
     assets_by_page: {"images": [...], "css": [...], "js": [...]}
+    The parsed tree is returned so callers can rewrite links without parsing again.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    tree = parse_html(html)
     links = set()
     assets = {"images": [], "css": [], "js": []}
-    for a in soup.find_all("a", href=True):
-        abs_url = urljoin(base_url, a["href"])
-        links.add(abs_url)
-
-    if include_assets.get("images", True):
-        for img in soup.find_all("img", src=True):
-            assets["images"].append(urljoin(base_url, img["src"]))
-    if include_assets.get("css", True):
-        for l in soup.find_all("link", href=True):
-            if l.get("rel") and "stylesheet" in [r.lower() for r in l.get("rel")]:
-                assets["css"].append(urljoin(base_url, l["href"]))
-    if include_assets.get("js", True):
-        for s in soup.find_all("script", src=True):
-            assets["js"].append(urljoin(base_url, s["src"]))
+    want_images = include_assets.get("images", True)
+    want_css = include_assets.get("css", True)
+    want_js = include_assets.get("js", True)
+    # Single pass over the tags we care about
+    for el in tree.iter(*LINK_ATTRS):
+        value = el.get(LINK_ATTRS[el.tag])
+        if not value:
+            continue
+        if el.tag == "a":
+            links.add(urljoin(base_url, value))
+        elif el.tag == "img":
+            if want_images:
+                assets["images"].append(urljoin(base_url, value))
+        elif el.tag == "link":
+            if want_css and "stylesheet" in (el.get("rel") or "").lower().split():
+                assets["css"].append(urljoin(base_url, value))
+        elif want_js:
+            assets["js"].append(urljoin(base_url, value))
     # Filter unique
     for k in assets:
         assets[k] = list(dict.fromkeys(assets[k]))
-    return links, assets
+    return tree, links, assets
 
-def save_file(dest_root: Path, rel_path: Path, content: bytes) -> tuple[int, str]:
+def save_and_hash(dest: Path, chunks: Iterable[bytes]) -> tuple[int, str]:
+    """
+    Write chunks to dest and sha256 them in the same pass; returns (size, hexdigest).
+    """
+    h = sha256()
+    size = 0
+    ensure_dir(dest)
+    with open(dest, "wb", buffering=WRITE_BUFFER_SIZE) as f:
+        for chunk in chunks:
+            h.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    return size, h.hexdigest()
+
+def _store(dest_root: Path, rel_path: Path, chunks: Iterable[bytes], object_root: Path | None) -> tuple[int, str]:
     full_path = dest_root / rel_path
-    ensure_dir(full_path)
-    full_path.write_bytes(content)
-    return full_path.stat().st_size, file_sha256(content)
+    if object_root is None:
+        return save_and_hash(full_path, chunks)
+    tmp = _object_tmp(object_root)
+    try:
+        size, digest = save_and_hash(tmp, chunks)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        raise
+    _commit_object(object_root, tmp, digest, full_path)
+    return size, digest
+
+def save_file(dest_root: Path, rel_path: Path, content: bytes, object_root: Path | None = None) -> tuple[int, str]:
+    if object_root is not None:
+        # In-memory content can be hashed up front, skipping the write when the object exists
+        digest = file_sha256(content)
+        try:
+            _reuse_object(object_path(object_root, digest), dest_root / rel_path)
+            return len(content), digest
+        except FileNotFoundError:
+            pass
+    return _store(dest_root, rel_path, (content,), object_root)
+
+def save_stream(dest_root: Path, rel_path: Path, resp: requests.Response,
+                object_root: Path | None = None) -> tuple[int, str]:
+    """
+    Write a streaming response body to disk, hashing it in the same pass.
+    With an object_root the body goes to the content-addressable store and the
+    snapshot path becomes a hardlink to it.
+    """
+    try:
+        return _store(dest_root, rel_path, resp.iter_content(STREAM_CHUNK_SIZE), object_root)
+    finally:
+        resp.close()
+
+def _object_tmp(object_root: Path) -> Path:
+    # Temp files live inside the store so the final rename never crosses filesystems
+    tmp_dir = object_root / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+    os.close(fd)
+    return Path(tmp)
+
+def _reuse_object(obj: Path, dest: Path):
+    """
+    Link an existing object at dest; FileNotFoundError if it is not (or no longer) stored.
+    """
+    # Pruning goes by mtime, so touching the object keeps it inside the grace window
+    os.utime(obj)
+    link_object(obj, dest)
+
+def _commit_object(object_root: Path, tmp: Path, digest: str, dest: Path):
+    """
+    Link the object for digest at dest, storing the finished temp file if the store lacks it.
+    """
+    obj = object_path(object_root, digest)
+    try:
+        _reuse_object(obj, dest)
+    except FileNotFoundError:
+        # Missing, or pruned by another site's retention since the check: keep our copy
+        os.chmod(tmp, OBJECT_FILE_MODE)
+        ensure_dir(obj)
+        os.replace(tmp, obj)
+        link_object(obj, dest)
+    else:
+        tmp.unlink(missing_ok=True)
+
+def previous_copy(prev: dict, object_root: Path | None) -> Path | None:
+    """
+    Local copy of a file recorded by the previous snapshot, if one is still on disk.
+    """
+    candidates = []
+    if object_root is not None and prev.get("sha256"):
+        candidates.append(object_path(object_root, prev["sha256"]))
+    if prev.get("path"):
+        candidates.append(Path(prev["path"]))
+    return next((p for p in candidates if p.exists()), None)
+
+def conditional_headers(prev: dict | None, object_root: Path | None) -> dict | None:
+    # Only revalidate when a 304 could actually be served from a local copy
+    if not prev or previous_copy(prev, object_root) is None:
+        return None
+    headers = {}
+    if prev.get("etag"):
+        headers["If-None-Match"] = prev["etag"]
+    if prev.get("last_modified"):
+        headers["If-Modified-Since"] = prev["last_modified"]
+    return headers or None
+
+ASSET_DEPTH = math.inf  # assets never enqueue children
+
+class ProgressRelay:
+    """
+    Delivers progress callbacks on a background thread so a slow callback never
+    stalls the crawl. Only the latest event is kept if the consumer falls behind.
+    """
+    def __init__(self, callback):
+        self._callback = callback
+        self._latest: deque[tuple] = deque(maxlen=1)
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="crawl-progress", daemon=True)
+        self._thread.start()
+
+    def __call__(self, *event):
+        self._latest.append(event)
+        self._wake.set()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while self._latest:
+                try:
+                    event = self._latest.popleft()
+                except IndexError:
+                    break
+                try:
+                    self._callback(*event)
+                except Exception as e:
+                    logger.warning(f"Progress callback failed: {e}")
+            if self._closed and not self._latest:
+                return
 
 def crawl_website(base_url: str, dest_root: Path, depth: int, include_assets: dict, max_workers: int,
-                  progress_cb=None) -> tuple[list[dict], dict[str, Path]]:
+                  progress_cb=None, object_root: Path | None = None,
+                  previous: dict[str, dict] | None = None) -> tuple[list[dict], dict[str, Path]]:
     """
-    BFS crawl up to depth; return list of file records and url->relpath map
+    Pipelined crawl up to depth; return list of file records and url->relpath map.
+    Pages and assets share one pool and are submitted as soon as they are discovered,
+    so fetches overlap across depths. Pages are written last so their links can be
+    rewritten against the complete url map.
+    If object_root is given, file payloads are deduplicated into that sha256-keyed store.
+    previous maps url -> file record of the last snapshot; assets are revalidated with
+    If-None-Match/If-Modified-Since and reused on 304 instead of downloaded again.
+    progress_cb(url, kind, count) is invoked from a background thread.
     """
+    relay = ProgressRelay(progress_cb) if progress_cb else None
+    try:
+        return _crawl(base_url, dest_root, depth, include_assets, max_workers, relay, object_root, previous)
+    finally:
+        if relay:
+            relay.close()
+
+def _crawl(base_url: str, dest_root: Path, depth: int, include_assets: dict, max_workers: int,
+           progress_cb, object_root: Path | None, previous: dict[str, dict] | None) -> tuple[list[dict], dict[str, Path]]:
+    previous = previous or {}
     base_domain = domain_from_url(base_url)
-    visited_pages = set()
-    to_visit = deque([base_url])
+    asset_flags = {
+        "images": include_assets.get("images", True),
+        "css": include_assets.get("css", True),
+        "js": include_assets.get("js", True),
+    }
     url_map: dict[str, Path] = {}
     files_meta: list[dict] = []
+    pages: list[tuple[str, Path, HtmlElement]] = []
+    fetched = 0
+
+    # Results are consumed on this thread only, so the bookkeeping below needs no lock.
+    # seen gates every enqueue (pages and assets, internal or not), so each URL is checked once.
+    seen: set[str] = {base_url}
+    depth_of: dict[str, float] = {base_url: 0}
+    # Links of pages already parsed, kept in case the page is later reached at a smaller depth
+    page_links: dict[str, set[str]] = {}
+    # Assets fetched again without conditional headers after an unusable 304
+    refetched: set[str] = set()
+    pending: dict[Future, str] = {}
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for current_depth in range(depth + 1):
-            if not to_visit:
-                break
-            batch = list({u for u in list(to_visit) if is_internal_link(base_domain, u)})
-            to_visit.clear()
-
-            futures = {executor.submit(fetch, url): url for url in batch if url not in visited_pages}
-            for future in as_completed(futures):
-                url = futures[future]
+        def enqueue(url: str, url_depth: float):
+            if url in seen:
+                # Completion order decides which path finds a page first; keep the shallowest depth
+                known = depth_of.get(url)
+                if known is not None and known != ASSET_DEPTH and url_depth < known:
+                    depth_of[url] = url_depth
+                    if url in page_links and url_depth < depth:
+                        for link in page_links[url]:
+                            enqueue(link, url_depth + 1)
+                return
+            seen.add(url)
+            if not is_internal_link(base_domain, url):
+                return
+            depth_of[url] = url_depth
+            headers = conditional_headers(previous.get(url), object_root) if url_depth == ASSET_DEPTH else None
+            pending[executor.submit(fetch, url, headers)] = url
+
+        pending[executor.submit(fetch, base_url)] = base_url
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                current_depth = depth_of[url]
+                is_asset = current_depth == ASSET_DEPTH
                 try:
                     resp = future.result()
                     content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
-                    text = resp.text if "html" in content_type or content_type == "" else ""
-                    raw = resp.content
+                    fetched += 1
+
+                    if is_asset:
+                        a_rel = url_to_relpath(base_url, url)
+                        prev = previous.get(url)
+                        if resp.status_code == 304:
+                            resp.close()
+                            local = previous_copy(prev, object_root) if prev else None
+                            try:
+                                if local is None:
+                                    raise FileNotFoundError(f"previous copy of {url} is gone")
+                                link_object(local, dest_root / a_rel)
+                            except FileNotFoundError:
+                                # Pruned after revalidation was requested: fetch the body through the
+                                # pool like any other asset rather than blocking this loop on retries
+                                if url in refetched:
+                                    raise
+                                refetched.add(url)
+                                pending[executor.submit(fetch, url)] = url
+                                continue
+                            size, h, content_type = prev["size"], prev["sha256"], prev["content_type"]
+                            etag = resp.headers.get("ETag") or prev.get("etag")
+                            last_modified = resp.headers.get("Last-Modified") or prev.get("last_modified")
+                        else:
+                            size, h = save_stream(dest_root, a_rel, resp, object_root)
+                            etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+                        url_map[url] = a_rel
+                        files_meta.append({
+                            "url": url, "rel_path": str(a_rel), "size": size, "sha256": h, "content_type": content_type,
+                            "etag": etag, "last_modified": last_modified
+                        })
+                        if progress_cb: progress_cb(url, 'asset', fetched)
+                        continue
 
                     # Decide rel path for page
                     rel_path = url_to_relpath(base_url, url)
@@ -89,61 +350,46 @@ def crawl_website(base_url: str, dest_root: Path, depth: int, include_assets: di
                         rel_path = rel_path.with_suffix(".html")
                     # If not html, treat as binary asset
                     if "html" not in content_type and rel_path.suffix.lower() not in (".html", ".htm"):
-                        size, h = save_file(dest_root, rel_path, raw)
+                        size, h = save_stream(dest_root, rel_path, resp, object_root)
                         url_map[url] = rel_path
                         files_meta.append({
                             "url": url, "rel_path": str(rel_path), "size": size,
-                            "sha256": h, "content_type": content_type
+                            "sha256": h, "content_type": content_type,
+                            "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")
                         })
-                        if progress_cb: progress_cb(url, 'asset', len(files_meta))
+                        if progress_cb: progress_cb(url, 'asset', fetched)
                         continue
 
                     # Parse page
-                    links, assets = extract_links(text, url, {
-                        "images": include_assets.get("images", True),
-                        "css": include_assets.get("css", True),
-                        "js": include_assets.get("js", True),
-                    })
-
-                    # Save page with rewritten links (only for downloaded URLs)
-                    soup = BeautifulSoup(text, "html.parser")
-                    # Tentatively map this url to rel_path for eventual rewrite
+                    text = resp.text if "html" in content_type or content_type == "" else ""
+                    resp.close()
+                    tree, links, assets = extract_links(text, url, asset_flags)
+                    page_links[url] = links
                     url_map[url] = rel_path
+                    pages.append((url, rel_path, tree))
+                    if progress_cb: progress_cb(url, 'page', fetched)
 
-                    # Save assets (sequentially to simplify)
+                    # Submit assets and next-level links right away
                     for group in ["images", "css", "js"]:
                         for asset_url in assets[group]:
-                            if not is_internal_link(base_domain, asset_url):
-                                continue
-                            try:
-                                a_resp = fetch(asset_url)
-                                a_raw = a_resp.content
-                                a_content_type = a_resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
-                                a_rel = url_to_relpath(base_url, asset_url)
-                                size, h = save_file(dest_root, a_rel, a_raw)
-                                url_map[asset_url] = a_rel
-                                files_meta.append({
-                                    "url": asset_url, "rel_path": str(a_rel), "size": size, "sha256": h, "content_type": a_content_type
-                                })
-                            except Exception as e:
-                                logger.warning(f"Asset fetch failed: {asset_url}: {e}")
-
-                    # Rewrite links for known URL map
-                    soup = rewrite_html_links(soup, url_map, url)
-                    html_bytes = soup.prettify("utf-8")
-                    size, h = save_file(dest_root, rel_path, html_bytes)
-                    files_meta.append({
-                        "url": url, "rel_path": str(rel_path), "size": size, "sha256": h, "content_type": "text/html"
-                    })
-                    visited_pages.add(url)
-                    if progress_cb: progress_cb(url, 'page', len(files_meta))
-
-                    # Enqueue next-level links
+                            enqueue(asset_url, ASSET_DEPTH)
                     if current_depth < depth:
                         for link in links:
-                            if is_internal_link(base_domain, link) and link not in visited_pages:
-                                to_visit.append(link)
+                            enqueue(link, current_depth + 1)
 
                 except Exception as e:
-                    logger.warning(f"Fetch failed: {url}: {e}")
+                    kind = "Asset fetch" if is_asset else "Fetch"
+                    logger.warning(f"{kind} failed: {url}: {e}")
+
+    # Rewrite links for known URL map and save pages
+    for url, rel_path, tree in pages:
+        try:
+            tree = rewrite_html_links(tree, url_map, url)
+            html_bytes = serialize_html(tree)
+            size, h = save_file(dest_root, rel_path, html_bytes, object_root)
+            files_meta.append({
+                "url": url, "rel_path": str(rel_path), "size": size, "sha256": h, "content_type": "text/html"
+            })
+        except Exception as e:
+            logger.warning(f"Saving page failed: {url}: {e}")
     return files_meta, url_map
\ No newline at end of file
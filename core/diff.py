@@ -1,14 +1,21 @@
-import difflib
 from pathlib import Path
 import html
+from diff_match_patch import diff_match_patch
+
+DIFF_TIMEOUT_SECONDS = 2.0
 
 def generate_html_diff(old_path: Path, new_path: Path, title: str = "HTML Diff") -> str:
     """
-    Generate color-coded HTML diff using difflib.HtmlDiff
+    Generate color-coded HTML diff using diff-match-patch; its common prefix/suffix trimming
+    and timeout-bounded bisect keep large pages fast without a native extension
     """
-    old_text = old_path.read_text(encoding="utf-8", errors="ignore").splitlines()
-    new_text = new_path.read_text(encoding="utf-8", errors="ignore").splitlines()
-    diff = difflib.HtmlDiff(wrapcolumn=120).make_file(old_text, new_text, fromdesc=str(old_path.name), todesc=str(new_path.name))
+    old_text = old_path.read_text(encoding="utf-8", errors="ignore")
+    new_text = new_path.read_text(encoding="utf-8", errors="ignore")
+    dmp = diff_match_patch()
+    dmp.Diff_Timeout = DIFF_TIMEOUT_SECONDS
+    diffs = dmp.diff_main(old_text, new_text)
+    dmp.diff_cleanupSemantic(diffs)
+    diff = dmp.diff_prettyHtml(diffs)
     # Add a minimal style for readability
     return f"""
 <!doctype html>
@@ -16,12 +23,13 @@ def generate_html_diff(old_path: Path, new_path: Path, title: str = "HTML Diff")
 <meta charset="utf-8">
 <title>{html.escape(title)}</title>
 <style>
-table.diff {{font-family: monospace; font-size: 12px; border: 1px solid #ccc;}}
-.diff_add {{background: #e6ffe6;}}
-.diff_chg {{background: #fff7cc;}}
-.diff_sub {{background: #ffe6e6;}}
+.diff_hdr {{font-family: sans-serif; font-size: 13px; margin-bottom: 8px;}}
+.diff_hdr del {{background: #ffe6e6;}}
+.diff_hdr ins {{background: #e6ffe6;}}
+div.diff {{font-family: monospace; font-size: 12px; border: 1px solid #ccc; padding: 4px; white-space: pre-wrap; word-break: break-all;}}
 </style>
 </head><body>
-{diff}
+<div class="diff_hdr"><del>{html.escape(old_path.name)}</del> &rarr; <ins>{html.escape(new_path.name)}</ins></div>
+<div class="diff">{diff}</div>
 </body></html>
 """
\ No newline at end of file
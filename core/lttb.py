@@ -0,0 +1,38 @@
+from typing import Sequence
+
+Point = tuple[float, float]
+
+def lttb_downsample(points: Sequence[Point], threshold: int) -> list[Point]:
+    """
+    Largest-Triangle-Three-Buckets downsampling of an x-sorted series.
+    Keeps the first and last points and, per bucket, the point forming the largest triangle
+    with the previously kept point and the next bucket's average. Returns the input unchanged
+    when it already fits within threshold (or threshold < 3).
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        bucket = points[avg_start:avg_end]
+        avg_x = sum(p[0] for p in bucket) / len(bucket)
+        avg_y = sum(p[1] for p in bucket) / len(bucket)
+
+        ax, ay = points[a]
+        max_area = -1.0
+        next_a = int(i * every) + 1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        sampled.append(points[next_a])
+        a = next_a
+    sampled.append(points[-1])
+    return sampled
\ No newline at end of file
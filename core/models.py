@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, BigInteger
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum, BigInteger, Index
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import datetime
 from config.database import Base
@@ -38,6 +38,8 @@ class Website(Base):
 
 class BackupSnapshot(Base):
     __tablename__ = "snapshots"
+    # Covers per-website lookups as well as retention's ORDER BY created_at
+    __table_args__ = (Index("ix_snap_ws_created", "website_id", "created_at"),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     website_id: Mapped[int] = mapped_column(ForeignKey("websites.id"), nullable=False)
     timestamp: Mapped[str] = mapped_column(String, nullable=False)  # e.g. 20250103_235912
@@ -53,11 +55,15 @@ class BackupSnapshot(Base):
 
 class BackupFile(Base):
     __tablename__ = "files"
+    # Serves per-snapshot lookups as well as the diff viewer's per-snapshot content-type filter
+    __table_args__ = (Index("ix_files_snap_ctype", "snapshot_id", "content_type"),)
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     snapshot_id: Mapped[int] = mapped_column(ForeignKey("snapshots.id"), nullable=False)
     url: Mapped[str] = mapped_column(String, nullable=False)
     rel_path: Mapped[str] = mapped_column(String, nullable=False)
     content_type: Mapped[str | None] = mapped_column(String, nullable=True)
     size: Mapped[int] = mapped_column(Integer, default=0)
-    sha256: Mapped[str | None] = mapped_column(String, nullable=True)
+    sha256: Mapped[str | None] = mapped_column(String, nullable=True, index=True)
+    etag: Mapped[str | None] = mapped_column(String, nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(String, nullable=True)  # raw Last-Modified header
     snapshot: Mapped[BackupSnapshot] = relationship("BackupSnapshot", back_populates="files")
\ No newline at end of file
@@ -1,16 +1,85 @@
 import logging
-from plyer import notification
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+SMTP_TIMEOUT = 30
+
+class SmtpConnection:
+    """
+    Keeps one authenticated SMTP session open between messages and reconnects
+    when the server has dropped it. Backups run far apart, so the session is
+    probed with NOOP before use and any failed send is retried once on a fresh one.
+    """
+    def __init__(self):
+        self._conn: smtplib.SMTP | None = None
+
+    def _connect(self):
+        conn = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=SMTP_TIMEOUT)
+        conn.starttls()
+        if settings.SMTP_USER:
+            conn.login(settings.SMTP_USER, settings.SMTP_PASS)
+        self._conn = conn
+
+    def _alive(self) -> bool:
+        try:
+            return self._conn.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, msg: MIMEText):
+        if self._conn is not None and not self._alive():
+            self.close()
+        if self._conn is None:
+            self._connect()
+        try:
+            self._conn.send_message(msg)
+        except (smtplib.SMTPException, OSError):
+            # Idle sessions are not always dropped cleanly (e.g. a 421 reply instead of a disconnect)
+            self.close()
+            self._connect()
+            self._conn.send_message(msg)
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.quit()
+        except Exception:
+            pass
+        self._conn = None
+
 class Notifier:
+    def __init__(self):
+        self._smtp = SmtpConnection()
+        # One worker keeps notifications ordered and off the backup thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notifier")
+
+    def close(self):
+        """
+        Deliver queued notifications, then log out of the SMTP server.
+        """
+        self._executor.shutdown(wait=True)
+        self._smtp.close()
+
+    def _submit(self, fn, *args):
+        try:
+            self._executor.submit(fn, *args)
+        except RuntimeError:
+            logger.warning("Notifier already closed; notification dropped.")
+
     def desktop(self, title: str, message: str):
         if not settings.DESKTOP_NOTIFICATIONS:
             return
+        self._submit(self._notify_desktop, title, message)
+
+    def _notify_desktop(self, title: str, message: str):
         try:
+            # Imported on first use: plyer pulls in platform backends at import time
+            from plyer import notification
             notification.notify(title=title, message=message, timeout=5)
         except Exception as e:
             logger.warning(f"Desktop notification failed: {e}")
@@ -22,16 +91,15 @@ class Notifier:
         if not to_addr:
             logger.warning("Email notify enabled but no recipient configured.")
             return
+        msg = MIMEText(body, "plain", "utf-8")
+        msg["Subject"] = subject
+        msg["From"] = settings.SMTP_USER
+        msg["To"] = to_addr
+        self._submit(self._send_email, msg)
+
+    def _send_email(self, msg: MIMEText):
         try:
-            msg = MIMEText(body, "plain", "utf-8")
-            msg["Subject"] = subject
-            msg["From"] = settings.SMTP_USER
-            msg["To"] = to_addr
-
-            with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-                server.starttls()
-                if settings.SMTP_USER:
-                    server.login(settings.SMTP_USER, settings.SMTP_PASS)
-                server.send_message(msg)
+            self._smtp.send(msg)
         except Exception as e:
+            self._smtp.close()
             logger.warning(f"Email notification failed: {e}")
\ No newline at end of file
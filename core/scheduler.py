@@ -1,4 +1,5 @@
 import logging
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
@@ -21,11 +22,14 @@ class SchedulerService:
 
     def shutdown(self):
         self.scheduler.shutdown(wait=False)
+        self.backup_mgr.close()
 
     def load_jobs(self):
         # Clear any existing jobs and re-add from DB
         self.scheduler.remove_all_jobs()
-        websites = self.session.query(Website).filter_by(active=True).all()
+        # The session keeps objects across commits (expire_on_commit=False); re-read rows so
+        # jobs are built from what is in the database, not from cached attributes
+        websites = self.session.query(Website).filter_by(active=True).populate_existing().all()
         for w in websites:
             self._add_job_for_website(w)
 
@@ -64,7 +68,7 @@ class SchedulerService:
             logger.exception(f"Scheduled backup failed for {website_id}: {e}")
 
     def reschedule(self, website_id: int):
-        w = self.session.get(Website, website_id)
+        w = self.session.get(Website, website_id, populate_existing=True)
         if not w:
             return
         if w.job_id:
@@ -75,6 +79,14 @@ class SchedulerService:
         if w.active:
             self._add_job_for_website(w)
 
+    def add_job_listener(self, callback):
+        # callback(event) runs on the scheduler thread after every backup job
+        self.scheduler.add_listener(callback, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
+
+    def get_all_next_runs(self) -> dict[str, datetime]:
+        # One pass over the job store instead of a locked lookup per website
+        return {job.id: job.next_run_time for job in self.scheduler.get_jobs()}
+
     def get_job_next_run(self, job_id: str | None):
         if not job_id:
             return None
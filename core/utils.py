@@ -1,16 +1,25 @@
 from urllib.parse import urlparse, urljoin
-from pathlib import Path
+from pathlib import Path, PurePosixPath
+from functools import lru_cache
 from hashlib import sha256
 from datetime import datetime
-import re
-from bs4 import BeautifulSoup
+import os
+import posixpath
+import shutil
+import string
+import lxml.etree
+import lxml.html
 
-def domain_from_url(url: str) -> str:
+@lru_cache(maxsize=1024)
+def _netloc(url: str) -> str:
     return urlparse(url).netloc.lower()
 
+def domain_from_url(url: str) -> str:
+    return _netloc(url)
+
 def is_internal_link(base_domain: str, url: str) -> bool:
-    parsed = urlparse(url)
-    return (parsed.netloc == "" or parsed.netloc.lower() == base_domain)
+    netloc = _netloc(url)
+    return (netloc == "" or netloc == base_domain)
 
 def timestamp_str() -> str:
     return datetime.utcnow().strftime("%Y%m%d_%H%M%S")
@@ -20,48 +29,131 @@ def file_sha256(data: bytes) -> str:
     h.update(data)
     return h.hexdigest()
 
+def manifest_sha256(files_meta: list[dict]) -> str:
+    """
+    Snapshot-level digest over the sorted (rel_path, sha256) pairs of its files.
+    Two snapshots with the same manifest hold identical content.
+    """
+    h = sha256()
+    for rel_path, digest in sorted((f["rel_path"], f.get("sha256") or "") for f in files_meta):
+        h.update(f"{rel_path}\0{digest}\n".encode("utf-8"))
+    return h.hexdigest()
+
 def ensure_dir(path: Path):
     path.parent.mkdir(parents=True, exist_ok=True)
 
+def object_path(object_root: Path, digest: str) -> Path:
+    """
+    Location of a payload in the content-addressable store: <root>/<sha[0:2]>/<sha>
+    """
+    return object_root / digest[:2] / digest
+
+def link_object(obj: Path, dest: Path):
+    """
+    Hardlink a stored object into a snapshot; copy where hardlinks are unsupported.
+    """
+    ensure_dir(dest)
+    # Never write through an existing link, it would modify the shared object
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(obj, dest)
+    except OSError:
+        shutil.copyfile(obj, dest)
+
+class _SafeCharTable(dict):
+    """
+    str.translate table: ASCII letters, digits and "._-" map to themselves, anything else to "_".
+    """
+    def __missing__(self, key):
+        return "_"
+
+_SAFE_CHARS = _SafeCharTable({ord(c): c for c in string.ascii_letters + string.digits + "._-"})
+
 def sanitize_filename(name: str) -> str:
-    return re.sub(r"[^a-zA-Z0-9._-]", "_", name)
+    return name.translate(_SAFE_CHARS)
 
+@lru_cache(maxsize=4096)
 def url_to_relpath(base_url: str, full_url: str) -> Path:
     """
     Map URL to a relative path within snapshot.
     - Directories => index.html
     - No extension => index.html
     - Assets stored as given (respect extension)
+    Works on URL path strings; a Path is only built for the result (cached per URL).
     """
     parsed = urlparse(full_url)
     p = parsed.path
     if p.endswith("/"):
         p = p + "index.html"
-    elif "." not in Path(p).name:
+    elif "." not in posixpath.basename(p):
         # Likely no extension, treat as directory page
-        p = Path(p) / "index.html"
-        p = str(p)
+        p = posixpath.join(p, "index.html")
     # Remove leading slash
-    if p.startswith("/"):
-        p = p[1:]
+    p = p.lstrip("/")
     # Query string hashed into filename for uniqueness
     if parsed.query:
-        stem = Path(p).stem
-        suffix = Path(p).suffix
+        name = PurePosixPath(p)
         qhash = sanitize_filename(parsed.query)[:32]
-        p = str(Path(Path(p).parent) / f"{stem}__{qhash}{suffix or '.html'}")
+        p = posixpath.join(posixpath.dirname(p), f"{name.stem}__{qhash}{name.suffix or '.html'}")
     return Path(p)
 
-def rewrite_html_links(soup: BeautifulSoup, url_map: dict[str, Path], base_url: str):
+# Link-bearing tags and the attribute holding their URL
+LINK_ATTRS = {"a": "href", "img": "src", "link": "href", "script": "src"}
+
+# default_doctype=False keeps libxml2 from inventing a doctype the page never had
+_HTML_PARSER = lxml.html.HTMLParser(default_doctype=False)
+_UTF8_HTML_PARSER = lxml.html.HTMLParser(encoding="utf-8", default_doctype=False)
+
+def parse_html(text: str) -> lxml.html.HtmlElement:
+    """
+    Parse a full HTML document with lxml; always returns the <html> root.
+    """
+    if not text.strip():
+        text = "<html></html>"
+    try:
+        try:
+            return lxml.html.document_fromstring(text, parser=_HTML_PARSER)
+        except ValueError:
+            # lxml rejects str input that carries an XML encoding declaration
+            return lxml.html.document_fromstring(text.encode("utf-8"), parser=_UTF8_HTML_PARSER)
+    except lxml.etree.ParserError:
+        # Nothing but comments/whitespace: no element to root a document on
+        return lxml.html.document_fromstring("<html></html>", parser=_HTML_PARSER)
+
+def _declare_utf8(tree: lxml.html.HtmlElement):
+    """
+    Point the page's charset declaration at UTF-8, the encoding serialize_html writes.
+    """
+    declared = False
+    for meta in tree.iter("meta"):
+        if meta.get("charset") is not None:
+            meta.set("charset", "utf-8")
+            declared = True
+        elif (meta.get("http-equiv") or "").lower() == "content-type":
+            meta.set("content", "text/html; charset=utf-8")
+            declared = True
+    if not declared:
+        head = tree.find("head")
+        if head is None:
+            head = lxml.html.Element("head")
+            tree.insert(0, head)
+        head.insert(0, lxml.html.Element("meta", charset="utf-8"))
+
+def serialize_html(tree: lxml.html.HtmlElement) -> bytes:
+    _declare_utf8(tree)
+    # etree.tostring: lxml.html.tostring strips http-equiv Content-Type metas
+    return lxml.etree.tostring(tree.getroottree(), method="html", encoding="utf-8")
+
+def rewrite_html_links(tree: lxml.html.HtmlElement, url_map: dict[str, Path], base_url: str):
     """
     Rewrite href/src to local rel paths for downloaded files.
     """
-    for tag, attr in [("a", "href"), ("img", "src"), ("link", "href"), ("script", "src")]:
-        for el in soup.find_all(tag):
-            link = el.get(attr)
-            if not link:
-                continue
-            abs_url = urljoin(base_url, link)
-            if abs_url in url_map:
-                el[attr] = str(url_map[abs_url])
-    return soup
\ No newline at end of file
+    for el in tree.iter(*LINK_ATTRS):
+        attr = LINK_ATTRS[el.tag]
+        link = el.get(attr)
+        if not link:
+            continue
+        abs_url = urljoin(base_url, link)
+        if abs_url in url_map:
+            el.set(attr, str(url_map[abs_url]))
+    return tree
\ No newline at end of file
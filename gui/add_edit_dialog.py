@@ -93,28 +93,30 @@ class AddEditWebsiteDialog(QDialog):
             QMessageBox.warning(self, "Invalid URL", "Please enter a valid URL, e.g., https://example.com")
             return
 
-        domain = domain_from_url(url)
-        if self.website is None:
-            w = Website(url=url, domain=domain)
-            self.session.add(w)
-        else:
-            w = self.website
-            w.url = url
-            w.domain = domain
+        # Apply every field before the single commit; nothing is flushed half-edited
+        with self.session.no_autoflush:
+            domain = domain_from_url(url)
+            if self.website is None:
+                w = Website(url=url, domain=domain)
+                self.session.add(w)
+            else:
+                w = self.website
+                w.url = url
+                w.domain = domain
 
-        w.crawl_depth = self.depth_spin.value()
-        w.include_images = self.images_chk.isChecked()
-        w.include_css = self.css_chk.isChecked()
-        w.include_js = self.js_chk.isChecked()
-        w.retention_limit = self.retention_spin.value()
-        w.compress_old = self.compress_chk.isChecked()
-        w.max_workers = self.max_workers_spin.value()
-        stype = self.schedule_combo.currentText()
-        w.schedule_type = getattr(ScheduleType, stype)
-        w.interval_minutes = self.interval_spin.value() if stype == "interval" else None
-        w.daily_time = self.daily_time_edit.text().strip() if stype == "daily" else None
-        w.cron_expression = self.cron_edit.text().strip() if stype == "cron" else None
-        w.email_notify = self.email_chk.isChecked()
-        w.email_to = self.email_to_edit.text().strip() or None
+            w.crawl_depth = self.depth_spin.value()
+            w.include_images = self.images_chk.isChecked()
+            w.include_css = self.css_chk.isChecked()
+            w.include_js = self.js_chk.isChecked()
+            w.retention_limit = self.retention_spin.value()
+            w.compress_old = self.compress_chk.isChecked()
+            w.max_workers = self.max_workers_spin.value()
+            stype = self.schedule_combo.currentText()
+            w.schedule_type = getattr(ScheduleType, stype)
+            w.interval_minutes = self.interval_spin.value() if stype == "interval" else None
+            w.daily_time = self.daily_time_edit.text().strip() if stype == "daily" else None
+            w.cron_expression = self.cron_edit.text().strip() if stype == "cron" else None
+            w.email_notify = self.email_chk.isChecked()
+            w.email_to = self.email_to_edit.text().strip() or None
         self.session.commit()
         self.accept()
\ No newline at end of file
@@ -1,15 +1,20 @@
 from PySide6.QtCore import Qt, QUrl
 from PySide6.QtGui import QDesktopServices
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QFileDialog
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QFileDialog, QStackedWidget
 from PySide6.QtWebEngineWidgets import QWebEngineView
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from core.models import Website, BackupSnapshot, BackupFile
 from core.diff import generate_html_diff
+from collections import OrderedDict
 from pathlib import Path
+import filecmp
 import zipfile
 import tempfile
 import shutil
 
+DIFF_CACHE_SIZE = 32
+
 class DiffViewer(QWidget):
     def __init__(self, session: Session, parent=None):
         super().__init__(parent)
@@ -21,14 +26,28 @@ class DiffViewer(QWidget):
         # Ensure resources are freed when closed
         self.setAttribute(Qt.WA_DeleteOnClose, True)
 
-        # Track temporary extraction directories so we can clean them up
-        self._temp_dirs: list[Path] = []
+        # Scratch directory for extracted files and the rendered diff, created on first use
+        self._tmp_root: Path | None = None
+        # Open zip handles, and files already extracted from them
+        self._zip_cache: dict[Path, zipfile.ZipFile] = {}
+        self._extracted: dict[tuple[int, str], Path] = {}
+        # Rendered diffs keyed by (snapshot A id, snapshot B id, rel path), least recently used first
+        self._diff_cache: OrderedDict[tuple[int, int, str], str] = OrderedDict()
 
         self.website_combo = QComboBox()
         self.snap_a_combo = QComboBox()
         self.snap_b_combo = QComboBox()
         self.page_combo = QComboBox()
         self.view = QWebEngineView()
+        # Status messages go to a plain label instead of loading a page into the web view
+        self.message_label = QLabel()
+        self.message_label.setAlignment(Qt.AlignCenter)
+        self.message_label.setStyleSheet("font-style: italic;")
+        self._stack = QStackedWidget()
+        self._stack.addWidget(self.view)
+        self._stack.addWidget(self.message_label)
+        # Diffs are written to one stable file and loaded by URL
+        self._current_diff_path: Path | None = None
 
         top = QHBoxLayout()
         top.addWidget(QLabel("Website:")); top.addWidget(self.website_combo)
@@ -52,7 +71,7 @@ class DiffViewer(QWidget):
         layout = QVBoxLayout(self)
         layout.addLayout(top)
         layout.addLayout(btn_layout)
-        layout.addWidget(self.view)
+        layout.addWidget(self._stack)
 
         self.website_combo.currentIndexChanged.connect(self._website_changed)
         self.snap_a_combo.currentIndexChanged.connect(self._snap_changed)
@@ -69,12 +88,14 @@ class DiffViewer(QWidget):
 
     def closeEvent(self, event):
         # Cleanup any temporary extracted files
-        for d in self._temp_dirs:
-            try:
-                shutil.rmtree(d, ignore_errors=True)
-            except Exception:
-                pass
-        self._temp_dirs.clear()
+        if self._tmp_root is not None:
+            shutil.rmtree(self._tmp_root, ignore_errors=True)
+            self._tmp_root = None
+        self._current_diff_path = None
+        for zf in self._zip_cache.values():
+            zf.close()
+        self._zip_cache.clear()
+        self._extracted.clear()
         super().closeEvent(event)
 
     def _populate_websites(self):
@@ -88,14 +109,14 @@ class DiffViewer(QWidget):
         self.snap_a_combo.clear(); self.snap_b_combo.clear(); self.page_combo.clear()
         website_id = self.website_combo.currentData()
         if not website_id:
-            self.view.setHtml("<i>No website selected.</i>")
+            self._show_message("No website selected.")
             return
         snaps = (self.session.query(BackupSnapshot)
                  .filter(BackupSnapshot.website_id == website_id)
                  .order_by(BackupSnapshot.created_at.desc())
                  .all())
         if not snaps:
-            self.view.setHtml("<i>No snapshots for this website yet.</i>")
+            self._show_message("No snapshots for this website yet.")
             return
         for s in snaps:
             label = f"{s.timestamp}{' (zip)' if s.compressed else ''}"
@@ -108,22 +129,20 @@ class DiffViewer(QWidget):
         a_id = self.snap_a_combo.currentData()
         b_id = self.snap_b_combo.currentData()
         if not a_id or not b_id:
-            self.view.setHtml("<i>Select two snapshots to compare.</i>")
+            self._show_message("Select two snapshots to compare.")
             return
-        # Intersect pages present in both snapshots
-        a_files = self.session.query(BackupFile).filter(
+        # Intersect pages present in both snapshots in SQL, fetching only rel_path
+        a_pages = select(BackupFile.rel_path).where(
             BackupFile.snapshot_id == a_id,
             BackupFile.content_type.like("%html%")
-        ).all()
-        b_files = self.session.query(BackupFile).filter(
+        )
+        b_pages = select(BackupFile.rel_path).where(
             BackupFile.snapshot_id == b_id,
             BackupFile.content_type.like("%html%")
-        ).all()
-        a_set = {f.rel_path for f in a_files}
-        b_set = {f.rel_path for f in b_files}
-        common = sorted(a_set.intersection(b_set))
+        )
+        common = self.session.execute(a_pages.intersect(b_pages).order_by(BackupFile.rel_path)).scalars().all()
         if not common:
-            self.view.setHtml("<i>No common HTML pages between these snapshots.</i>")
+            self._show_message("No common HTML pages between these snapshots.")
             return
         for rel in common:
             self.page_combo.addItem(rel, rel)
@@ -134,7 +153,12 @@ class DiffViewer(QWidget):
         Return a local filesystem path for the requested file.
         - If snapshot folder exists: return path directly.
         - If snapshot is compressed (zip exists): extract only that file to a temp dir and return the extracted path.
+        Extracted paths are remembered per (snapshot, file) for the lifetime of the viewer.
         """
+        cached = self._extracted.get((snap.id, rel))
+        if cached is not None and cached.exists():
+            return cached
+
         candidate = Path(snap.path) / rel
         if candidate.exists():
             return candidate
@@ -144,25 +168,54 @@ class DiffViewer(QWidget):
         if zip_path.exists():
             rel_posix = Path(rel).as_posix()
             try:
-                with zipfile.ZipFile(zip_path, "r") as zf:
-                    # Quick membership test
-                    names = set(zf.namelist())
-                    if rel_posix not in names:
-                        return None
-                    tempdir = Path(tempfile.mkdtemp(prefix=f"siteguardian_diff_{snap.timestamp}_"))
-                    self._temp_dirs.append(tempdir)
-                    zf.extract(rel_posix, tempdir)
-                    return tempdir / rel_posix
+                zf = self._open_zip(zip_path)
+                try:
+                    zf.getinfo(rel_posix)  # lookup in the index parsed at open time
+                except KeyError:
+                    return None
+                snap_dir = self._temp_dir() / str(snap.id)
+                target = snap_dir / rel_posix
+                if not target.exists():
+                    zf.extract(rel_posix, snap_dir)
+                self._extracted[(snap.id, rel)] = target
+                return target
             except Exception:
                 return None
         return None
 
+    def _temp_dir(self) -> Path:
+        # One scratch dir per viewer: extractions go under <snapshot id>/, the diff page at the top
+        if self._tmp_root is None:
+            self._tmp_root = Path(tempfile.mkdtemp(prefix="siteguardian_diff_"))
+        return self._tmp_root
+
+    def _open_zip(self, zip_path: Path) -> zipfile.ZipFile:
+        # Keep the handle open so the central directory is parsed once per viewer
+        zf = self._zip_cache.get(zip_path)
+        if zf is None:
+            zf = zipfile.ZipFile(zip_path, "r")
+            self._zip_cache[zip_path] = zf
+        return zf
+
     def _render_diff(self):
         a_id = self.snap_a_combo.currentData()
         b_id = self.snap_b_combo.currentData()
         rel = self.page_combo.currentData()
         if not (a_id and b_id and rel):
-            self.view.setHtml("<i>Select snapshots and a page to diff.</i>")
+            self._show_message("Select snapshots and a page to diff.")
+            return
+
+        key = (a_id, b_id, rel)
+        cached = self._diff_cache.get(key)
+        if cached is not None:
+            self._diff_cache.move_to_end(key)
+            self._show_diff(cached)
+            return
+
+        # Content hashes recorded at backup time settle unchanged pages without touching the files
+        a_sha = self._file_sha256(a_id, rel)
+        if a_sha and a_sha == self._file_sha256(b_id, rel):
+            self._show_message("Files are identical.")
             return
 
         a_snap = self.session.get(BackupSnapshot, a_id)
@@ -172,11 +225,23 @@ class DiffViewer(QWidget):
         b_path = self._ensure_file_path(b_snap, rel)
 
         if not a_path or not b_path or not a_path.exists() or not b_path.exists():
-            self.view.setHtml("<i>One of the files is missing. If the snapshot is zipped, it will be extracted temporarily. Try again.</i>")
+            self._show_message("One of the files is missing. If the snapshot is zipped, it will be extracted temporarily. Try again.")
+            return
+
+        if filecmp.cmp(a_path, b_path, shallow=False):
+            self._show_message("Files are identical.")
             return
 
         diff_html = generate_html_diff(a_path, b_path, title=f"{rel}")
-        self.view.setHtml(diff_html)
+        self._diff_cache[key] = diff_html
+        if len(self._diff_cache) > DIFF_CACHE_SIZE:
+            self._diff_cache.popitem(last=False)
+        self._show_diff(diff_html)
+
+    def _file_sha256(self, snapshot_id: int, rel: str) -> str | None:
+        return self.session.execute(
+            select(BackupFile.sha256).where(BackupFile.snapshot_id == snapshot_id, BackupFile.rel_path == rel)
+        ).scalars().first()
 
     def _snap_changed(self):
         self._populate_pages()
@@ -190,22 +255,30 @@ class DiffViewer(QWidget):
             self.snap_b_combo.setCurrentIndex(a_idx)
             self._populate_pages()
 
+    def _show_message(self, text: str):
+        self.message_label.setText(text)
+        self._stack.setCurrentWidget(self.message_label)
+
+    def _show_diff(self, diff_html: str):
+        if self._current_diff_path is None:
+            self._current_diff_path = self._temp_dir() / "current.html"
+        self._current_diff_path.write_text(diff_html, encoding="utf-8")
+        self.view.load(QUrl.fromLocalFile(str(self._current_diff_path)))
+        self._stack.setCurrentWidget(self.view)
+
+    def _has_diff(self) -> bool:
+        return self._current_diff_path is not None and self._stack.currentWidget() is self.view
+
     def _export_html(self):
         # Export the currently displayed diff HTML
-        def _save(content: str):
-            path, _ = QFileDialog.getSaveFileName(self, "Save Diff HTML", "diff.html", "HTML Files (*.html)")
-            if path:
-                Path(path).write_text(content or "", encoding="utf-8")
-        self.view.page().toHtml(_save)
+        if not self._has_diff():
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Save Diff HTML", "diff.html", "HTML Files (*.html)")
+        if path:
+            shutil.copyfile(self._current_diff_path, path)
 
     def _open_in_browser(self):
-        # Open the current diff in the system browser (writes a temp HTML file)
-        def _open(content: str):
-            if not content:
-                return
-            tmp_dir = Path(tempfile.mkdtemp(prefix="siteguardian_diffview_"))
-            self._temp_dirs.append(tmp_dir)
-            out = tmp_dir / "diff.html"
-            out.write_text(content, encoding="utf-8")
-            QDesktopServices.openUrl(QUrl.fromLocalFile(str(out)))
-        self.view.page().toHtml(_open)
\ No newline at end of file
+        # Open the current diff in the system browser
+        if not self._has_diff():
+            return
+        QDesktopServices.openUrl(QUrl.fromLocalFile(str(self._current_diff_path)))
\ No newline at end of file
@@ -4,43 +4,112 @@ import sys
 import subprocess
 from pathlib import Path
 
-from PySide6.QtCore import Qt, QTimer, QThread, Signal
+from PySide6.QtCore import Qt, QTimer, QThreadPool, QRunnable, QObject, Signal
 from PySide6.QtWidgets import (
-    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem,
+    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableView,
     QAbstractItemView, QSplitter, QPlainTextEdit, QLabel, QMessageBox
 )
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, load_only
 
 from config.settings import settings
+from config.database import SessionLocal
 from core.models import Website, BackupSnapshot
 from core.backup_manager import BackupManager
 from gui.add_edit_dialog import AddEditWebsiteDialog
 from gui.plot_widget import PlotWidget
-from gui.diff_viewer import DiffViewer
+from gui.websites_model import WebsiteRow, WebsitesModel
 
 logger = logging.getLogger(__name__)
 
-class BackupWorker(QThread):
+REFRESH_INTERVAL_MS = 10_000
+
+# Built once: every refresh reuses the same statement objects and their cached compiled SQL.
+# Only the rendered columns are loaded; raiseload turns any other attribute access into an
+# error instead of a silent per-row SELECT.
+WEBSITES_STMT = (
+    select(Website)
+    .options(load_only(
+        Website.id, Website.url, Website.domain, Website.schedule_type, Website.interval_minutes,
+        Website.daily_time, Website.cron_expression, Website.last_run_at, Website.last_status, Website.job_id,
+        raiseload=True,
+    ))
+    .order_by(Website.created_at.desc())
+)
+# One grouped count for all sites instead of a COUNT per row
+SNAP_COUNT_STMT = (
+    select(BackupSnapshot.website_id, func.count(BackupSnapshot.id))
+    .group_by(BackupSnapshot.website_id)
+)
+
+def _schedule_str(w: Website) -> str:
+    if w.schedule_type.name == "interval":
+        return f"Every {w.interval_minutes} min"
+    elif w.schedule_type.name == "daily":
+        return f"Daily at {w.daily_time}"
+    else:
+        return f"Cron: {w.cron_expression}"
+
+class RefreshSignals(QObject):
+    results_ready = Signal(object)  # list[WebsiteRow], or None on failure
+
+class RefreshWorker(QRunnable):
+    """
+    Runs the websites table queries on a pool thread with its own short-lived session
+    and hands display-ready rows back to the GUI thread.
+    """
+    def __init__(self, scheduler_service):
+        super().__init__()
+        self.scheduler_service = scheduler_service
+        self.signals = RefreshSignals()
+
+    def run(self):
+        try:
+            with SessionLocal() as session:
+                websites = session.execute(WEBSITES_STMT).scalars().all()
+                counts = dict(session.execute(SNAP_COUNT_STMT).all())
+                next_runs = self.scheduler_service.get_all_next_runs()
+                rows = []
+                for w in websites:
+                    next_run = next_runs.get(w.job_id)
+                    rows.append(WebsiteRow(
+                        id=w.id,
+                        domain=w.domain,
+                        url=w.url,
+                        schedule=_schedule_str(w),
+                        next_run=next_run.strftime("%Y-%m-%d %H:%M:%S") if next_run else "-",
+                        last_run=w.last_run_at.strftime("%Y-%m-%d %H:%M:%S") if w.last_run_at else "-",
+                        last_status=w.last_status or "-",
+                        snapshots=str(counts.get(w.id, 0)),
+                    ))
+        except Exception as e:
+            logger.exception(f"Refreshing websites table failed: {e}")
+            rows = None
+        self.signals.results_ready.emit(rows)
+
+class BackupSignals(QObject):
     progressed = Signal(str, str, int)  # url, type, count
     finished_ok = Signal(int)           # website_id
     finished_err = Signal(int, str)
 
+class BackupWorker(QRunnable):
     def __init__(self, backup_mgr: BackupManager, website_id: int):
         super().__init__()
         self.backup_mgr = backup_mgr
         self.website_id = website_id
+        self.signals = BackupSignals()
 
     def run(self):
         try:
             def cb(url, kind, count):
-                self.progressed.emit(url, kind, count)
+                self.signals.progressed.emit(url, kind, count)
             snap = self.backup_mgr.run_backup(self.website_id, progress_cb=cb)
             if snap:
-                self.finished_ok.emit(self.website_id)
+                self.signals.finished_ok.emit(self.website_id)
             else:
-                self.finished_err.emit(self.website_id, "Unknown error")
+                self.signals.finished_err.emit(self.website_id, "Unknown error")
         except Exception as e:
-            self.finished_err.emit(self.website_id, str(e))
+            self.signals.finished_err.emit(self.website_id, str(e))
 
 class MainWindow(QMainWindow):
     def __init__(self, session: Session, scheduler_service, qt_log_handler, parent=None):
@@ -51,13 +120,17 @@ class MainWindow(QMainWindow):
         self.backup_mgr = BackupManager(session=self.session)
         self.qt_log_handler = qt_log_handler
 
-        # Track child windows/threads
+        # Track child windows; manual backups share one bounded pool
         self._diff_viewer = None
-        self._workers: list[BackupWorker] = []
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, (os.cpu_count() or 2) // 2))
+        self._refresh_worker: RefreshWorker | None = None
+        self._refresh_again = False
 
         # UI components
-        self.table = QTableWidget(0, 7)
-        self.table.setHorizontalHeaderLabels(["Domain", "URL", "Schedule", "Next Run", "Last Run", "Last Status", "Snapshots"])
+        self.model = WebsitesModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.horizontalHeader().setStretchLastSection(True)
@@ -97,12 +170,31 @@ class MainWindow(QMainWindow):
         self.diff_btn.clicked.connect(self.open_diff)
         self.open_btn.clicked.connect(self.open_backups_dir)
         self.refresh_btn.clicked.connect(self.refresh_table)
-        self.table.itemSelectionChanged.connect(self._selection_changed)
+        self.table.selectionModel().selectionChanged.connect(lambda *_: self._selection_changed())
         self.qt_log_handler.log_signal.connect(self._append_log)
 
-        # Refresh timer
-        self.timer = QTimer(self); self.timer.timeout.connect(self.refresh_table); self.timer.start(3000)
+        # Refresh timer: single-shot and re-armed after each tick so slow refreshes never stack up.
+        # Ticks only rebuild the table when something changed and the window is on screen.
+        self._dirty = True
+        self.scheduler_service.add_job_listener(self._mark_dirty)
+        self.timer = QTimer(self); self.timer.setSingleShot(True); self.timer.timeout.connect(self._on_timer)
         self.refresh_table()
+        self.timer.start(REFRESH_INTERVAL_MS)
+
+    def _mark_dirty(self, *_):
+        # Called from the scheduler thread too; a plain flag write is enough here
+        self._dirty = True
+
+    def _on_timer(self):
+        # A minimized window still reports isVisible()
+        if self._dirty and self.isVisible() and not self.isMinimized():
+            self.refresh_table()
+        self.timer.start(REFRESH_INTERVAL_MS)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._dirty:
+            self.refresh_table()
 
     def _append_log(self, msg: str):
         self.log_view.appendPlainText(msg)
@@ -143,22 +235,11 @@ class MainWindow(QMainWindow):
             return
         self.status_label.setText(f"Running backup for {w.domain}...")
         worker = BackupWorker(backup_mgr=self.backup_mgr, website_id=w.id)
-        worker.progressed.connect(self._on_progress)
-        worker.finished_ok.connect(self._on_finished_ok)
-        worker.finished_err.connect(self._on_finished_err)
-        # Cleanup when done
-        worker.finished_ok.connect(lambda _: self._cleanup_worker(worker))
-        worker.finished_err.connect(lambda *_: self._cleanup_worker(worker))
-        worker.start()
-        # Keep reference to avoid GC
-        self._workers.append(worker)
-
-    def _cleanup_worker(self, worker: BackupWorker):
-        try:
-            self._workers.remove(worker)
-        except ValueError:
-            pass
-        worker.deleteLater()
+        worker.signals.progressed.connect(self._on_progress)
+        worker.signals.finished_ok.connect(self._on_finished_ok)
+        worker.signals.finished_err.connect(self._on_finished_err)
+        # Queued behind running backups once the pool is saturated; the pool owns and deletes it
+        self.pool.start(worker)
 
     def open_diff(self):
         # Open Diff Viewer as a separate top-level window (closable)
@@ -166,6 +247,8 @@ class MainWindow(QMainWindow):
             self._diff_viewer.raise_()
             self._diff_viewer.activateWindow()
             return
+        # Imported on first use: it pulls in QtWebEngine, which most sessions never need
+        from gui.diff_viewer import DiffViewer
         viewer = DiffViewer(session=self.session)  # no parent => real window with titlebar
         viewer.setAttribute(Qt.WA_DeleteOnClose, True)
         viewer.resize(1000, 700)
@@ -186,51 +269,47 @@ class MainWindow(QMainWindow):
         else:
             subprocess.call(["xdg-open", str(path)])
 
-    def _current_website(self) -> Website | None:
+    def _current_website_id(self) -> int | None:
         rows = self.table.selectionModel().selectedRows()
         if not rows:
             return None
-        ridx = rows[0].row()
-        w_id = self.table.item(ridx, 0).data(Qt.UserRole)
-        return self.session.get(Website, int(w_id)) if w_id else None
+        return self.model.website_id(rows[0].row())
+
+    def _current_website(self) -> Website | None:
+        w_id = self._current_website_id()
+        return self.session.get(Website, w_id) if w_id else None
 
     def refresh_table(self):
-        websites = self.session.query(Website).order_by(Website.created_at.desc()).all()
-        self.table.setRowCount(len(websites))
-        for i, w in enumerate(websites):
-            next_run = self.scheduler_service.get_job_next_run(w.job_id)
-            next_run_str = next_run.strftime("%Y-%m-%d %H:%M:%S") if next_run else "-"
-            last_run_str = w.last_run_at.strftime("%Y-%m-%d %H:%M:%S") if w.last_run_at else "-"
-            schedule_str = self._schedule_str(w)
-            snapshots_count = self.session.query(BackupSnapshot).filter(BackupSnapshot.website_id == w.id).count()
-
-            items = [
-                QTableWidgetItem(w.domain),
-                QTableWidgetItem(w.url),
-                QTableWidgetItem(schedule_str),
-                QTableWidgetItem(next_run_str),
-                QTableWidgetItem(last_run_str),
-                QTableWidgetItem(w.last_status or "-"),
-                QTableWidgetItem(str(snapshots_count)),
-            ]
-            for col, item in enumerate(items):
-                if col == 0:
-                    item.setData(Qt.UserRole, w.id)
-                self.table.setItem(i, col, item)
+        self._dirty = False
+        # One query batch at a time; a request made meanwhile re-runs once the current one lands
+        if self._refresh_worker is not None:
+            self._refresh_again = True
+            return
+        worker = RefreshWorker(self.scheduler_service)
+        worker.signals.results_ready.connect(self._apply_refresh)
+        self._refresh_worker = worker  # keeps the signals object alive until delivery
+        QThreadPool.globalInstance().start(worker)
+
+    def _apply_refresh(self, rows: list[WebsiteRow] | None):
+        self._refresh_worker = None
+        if rows is not None:
+            self._update_table(rows)
+        else:
+            # Keep the table due for the next tick instead of waiting for a scheduler event
+            self._dirty = True
+        if self._refresh_again:
+            self._refresh_again = False
+            self.refresh_table()
+
+    def _update_table(self, rows: list[WebsiteRow]):
+        # The model diffs rows itself and the selection model follows inserts/removals
+        self.model.set_rows(rows)
         self._selection_changed()
 
     def _selection_changed(self):
         w = self._current_website()
         self.plot.update_for_website(w.id if w else None)
 
-    def _schedule_str(self, w: Website) -> str:
-        if w.schedule_type.name == "interval":
-            return f"Every {w.interval_minutes} min"
-        elif w.schedule_type.name == "daily":
-            return f"Daily at {w.daily_time}"
-        else:
-            return f"Cron: {w.cron_expression}"
-
     def _on_progress(self, url: str, kind: str, count: int):
         self.progress_label.setText(f"Fetched {count} items... last: {url}")
 
@@ -1,42 +1,84 @@
+from PySide6.QtCharts import QChart, QChartView, QDateTimeAxis, QLineSeries, QValueAxis
+from PySide6.QtCore import QDateTime, QPointF, Qt
+from PySide6.QtGui import QPainter
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel
-from PySide6.QtWebEngineWidgets import QWebEngineView
-import plotly.graph_objects as go
-import plotly.io as pio
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from config.settings import settings
+from core.lttb import lttb_downsample
 from core.models import Website, BackupSnapshot
 
 class PlotWidget(QWidget):
     def __init__(self, session: Session, parent=None):
         super().__init__(parent)
         self.session = session
-        self.view = QWebEngineView()
+        # (website_id, snapshot count, newest snapshot id) of what is currently drawn
+        self._rendered_key = None
+
+        self.series = QLineSeries()
+        self.series.setName("Size (KB)")
+        self.series.setPointsVisible(True)
+        self.chart = QChart()
+        self.chart.addSeries(self.series)
+        self.chart.legend().hide()
+        self.chart.layout().setContentsMargins(0, 0, 0, 0)
+
+        self.axis_x = QDateTimeAxis()
+        self.axis_x.setFormat("yyyy-MM-dd HH:mm")
+        self.axis_x.setTitleText("Timestamp")
+        self.axis_y = QValueAxis()
+        self.axis_y.setTitleText("Size (KB)")
+        self.chart.addAxis(self.axis_x, Qt.AlignBottom)
+        self.chart.addAxis(self.axis_y, Qt.AlignLeft)
+        self.series.attachAxis(self.axis_x)
+        self.series.attachAxis(self.axis_y)
+
+        self.view = QChartView(self.chart)
+        self.view.setRenderHint(QPainter.Antialiasing)
+        self.view.setMinimumHeight(250)
         self.label = QLabel("Backup size over time")
         layout = QVBoxLayout(self)
         layout.addWidget(self.label)
         layout.addWidget(self.view)
 
+    def _show_message(self, text: str):
+        self.series.clear()
+        self.chart.setTitle(text)
+
     def update_for_website(self, website_id: int | None):
         if not website_id:
-            self.view.setHtml("<h3>No website selected</h3>")
+            self._rendered_key = None
+            self._show_message("No website selected")
             return
-        snaps = (self.session.query(BackupSnapshot)
-                 .filter(BackupSnapshot.website_id == website_id)
-                 .order_by(BackupSnapshot.created_at.asc())
-                 .all())
-        if not snaps:
-            self.view.setHtml("<i>No snapshots yet.</i>")
+        # Cheap aggregate first so periodic refreshes skip redrawing an unchanged chart
+        count, newest = self.session.execute(
+            select(func.count(BackupSnapshot.id), func.max(BackupSnapshot.id))
+            .where(BackupSnapshot.website_id == website_id)
+        ).one()
+        key = (website_id, count, newest)
+        if key == self._rendered_key:
             return
-        x = [s.created_at for s in snaps]
-        y = [s.total_size / 1024.0 for s in snaps]  # KB
-
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=x, y=y, mode="lines+markers", name="Size (KB)"))
-        fig.update_layout(
-            margin=dict(l=30, r=30, t=30, b=30),
-            xaxis_title="Timestamp",
-            yaxis_title="Size (KB)",
-            template="plotly_white",
-            height=250
-        )
-        html = pio.to_html(fig, include_plotlyjs="cdn", full_html=False)
-        self.view.setHtml(html)
\ No newline at end of file
+        self._rendered_key = key
+
+        # Only the two plotted columns; no ORM objects
+        rows = self.session.execute(
+            select(BackupSnapshot.created_at, BackupSnapshot.total_size)
+            .where(BackupSnapshot.website_id == website_id)
+            .order_by(BackupSnapshot.created_at.asc())
+        ).all()
+        if not rows:
+            self._show_message("No snapshots yet.")
+            return
+        data = [(created_at.timestamp() * 1000, total_size / 1024.0) for created_at, total_size in rows]  # KB
+        # Thousands of snapshots look the same as a few hundred well-chosen points
+        data = lttb_downsample(data, settings.PLOT_MAX_POINTS)
+        points = [QPointF(x, y) for x, y in data]
+        self.chart.setTitle("")
+        self.series.replace(points)
+
+        x_min, x_max = points[0].x(), points[-1].x()
+        if x_min == x_max:
+            x_min, x_max = x_min - 3_600_000, x_max + 3_600_000
+        y_max = max(p.y() for p in points)
+        self.axis_x.setRange(QDateTime.fromMSecsSinceEpoch(int(x_min)), QDateTime.fromMSecsSinceEpoch(int(x_max)))
+        self.axis_y.setRange(0, y_max * 1.1 if y_max else 1)
\ No newline at end of file
@@ -0,0 +1,80 @@
+from dataclasses import dataclass, fields
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+@dataclass(slots=True)
+class WebsiteRow:
+    id: int
+    domain: str
+    url: str
+    schedule: str
+    next_run: str
+    last_run: str
+    last_status: str
+    snapshots: str
+
+HEADERS = ["Domain", "URL", "Schedule", "Next Run", "Last Run", "Last Status", "Snapshots"]
+# Display fields in column order (everything but the id)
+COLUMN_FIELDS = [f.name for f in fields(WebsiteRow)][1:]
+
+class WebsitesModel(QAbstractTableModel):
+    """
+    Websites table backed by plain rows. set_rows() diffs against the current rows so
+    views only repaint changed cells and keep their selection across inserts/removals.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[WebsiteRow] = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMN_FIELDS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return getattr(row, COLUMN_FIELDS[index.column()])
+        if role == Qt.UserRole:
+            return row.id
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def website_id(self, row: int) -> int | None:
+        return self._rows[row].id if 0 <= row < len(self._rows) else None
+
+    def set_rows(self, rows: list[WebsiteRow]):
+        new_ids = {r.id for r in rows}
+        for i in range(len(self._rows) - 1, -1, -1):
+            if self._rows[i].id not in new_ids:
+                self.beginRemoveRows(QModelIndex(), i, i)
+                del self._rows[i]
+                self.endRemoveRows()
+
+        kept_ids = {r.id for r in self._rows}
+        if [r.id for r in self._rows] != [r.id for r in rows if r.id in kept_ids]:
+            # Existing rows changed order; not worth diffing
+            self.beginResetModel()
+            self._rows = list(rows)
+            self.endResetModel()
+            return
+
+        # Remaining rows are now a subsequence of the new ones: insert the gaps, update the rest
+        for i, row in enumerate(rows):
+            if i >= len(self._rows) or self._rows[i].id != row.id:
+                self.beginInsertRows(QModelIndex(), i, i)
+                self._rows.insert(i, row)
+                self.endInsertRows()
+                continue
+            old = self._rows[i]
+            if old == row:
+                continue
+            changed = [col for col, name in enumerate(COLUMN_FIELDS) if getattr(old, name) != getattr(row, name)]
+            self._rows[i] = row
+            self.dataChanged.emit(self.index(i, changed[0]), self.index(i, changed[-1]), [Qt.DisplayRole])
\ No newline at end of file
@@ -35,6 +35,9 @@ def main():
     setup_logging()
     init_db()
 
+    # QtWebEngine is imported lazily by the diff viewer, after the application exists;
+    # it requires shared OpenGL contexts to be requested up front
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     app.setApplicationName(settings.APP_NAME)
 
@@ -51,7 +54,11 @@ def main():
     window.show()
 
     ret = app.exec()
+    # Let running backups finish, but drop Run Now requests still waiting for a thread
+    window.pool.clear()
+    window.pool.waitForDone()
     scheduler_service.shutdown()
+    window.backup_mgr.close()
     session.close()
     sys.exit(ret)
 